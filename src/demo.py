@@ -1,22 +1,33 @@
-from datetime import datetime
-from time import sleep
-from collections import OrderedDict
+from time import monotonic_ns
+from queue import Queue, Empty, Full
+from threading import Thread, Event
 
+import av
 import cv2
 import json
+import numpy as np
+
+try:
+    from xxhash import xxh3_64_intdigest as frame_hash
+except ImportError:
+    # Slower than xxh3, but only runs on a 32x32 thumbnail
+    from zlib import crc32 as frame_hash
 
 from src.detectors.motion_watcher import MotionWatcher
 from src.detectors.canned_detector import CannedDetector
-from src.tracking.object_tracker import ObjectTracker
+from src.tracking.object_tracker import ObjectTracker, DetectedObject
 
 """
-Script for processing movies (movie in, display processed video on screen, 
+Script for processing movies (movie in, display processed video on screen,
 optional movie out).  Has a lot of specific code related to production of
-2 forklift videos.  
-
-This runs in SYNCHRONOUS mode (sequential processing of all movie frames).
-The code here also injects the object tracker algorithm for motion tracking
-and prediction.
+2 forklift videos.
+
+This runs a 3-stage threaded pipeline (reader -> processor -> writer/display)
+with bounded queues, so frame decode and encode/display overlap detection
+inference.  The detector and object tracker both run on the main thread only,
+since the tracker carries state from frame to frame and must see frames in
+order.  The code here also injects the object tracker algorithm for motion
+tracking and prediction.
 """
 
 # MobileNet watcher, else use movement detection
@@ -24,27 +35,37 @@ use_mobilenet = False
 use_motion_watcher = False
 use_yolov5_watcher = True
 
+# GPU-side NVDEC decode for the YoloV5 path (requires PyNvCodec + NVIDIA GPU)
+use_nvdec = False
+
 # Enable to write output movie from processed video stream
 write_processed_movie = False
 
+# Display processed video on screen.  Disable for headless runs - the
+# imshow/waitKey GUI pump costs ~1ms+ per frame
+display_video = True
+
 use_video_1 = False
 use_video_2 = True
 
 if use_video_1:
     # Video 1 was pre-processed to de-duplicate frames
-    cap = cv2.VideoCapture('forklift_deduped.mov')
+    video_path = 'forklift_deduped.mov'
     model_path = '../models/best.pt'
     # Don't skip frames - was pre-processed to de-dup
     skip_count = 0
+    dedup_frames = False
     output_fname = 'yolov5_plus_kalman_1.mov'
     movie_res = (1280, 720)
     dist_threshold = 0.025
 
 elif use_video_2:
-    cap = cv2.VideoCapture('../movies/Forklift Operator Runs Guy Over_360p.mp4')
+    video_path = '../movies/Forklift Operator Runs Guy Over_360p.mp4'
     model_path = '../models/model_demo2.pt'
-    # Source movie still has irregular duplicate frames
-    skip_count = 5
+    # Source movie still has irregular duplicate frames - drop them by
+    # content hash instead of blindly skipping every Nth frame
+    skip_count = 0
+    dedup_frames = True
     output_fname = 'yolov5_plus_kalman_2.mov'
     movie_res = (480, 360)
     dist_threshold = 0.1
@@ -53,8 +74,14 @@ elif use_video_2:
 # movie_res = (640, 360)
 movie_fps = 9.0
 
-# In-loop sleep time
-sleep_time = 0.07
+# Bounded queue depth between pipeline stages.  Back-pressure from the full
+# queues paces the reader; no in-loop sleep is needed.
+prefetch = 4
+
+# Frames per YoloV5 inference call.  Batching amortizes per-call launch
+# overhead on GPU; on CPU single-frame inference is as fast or faster, so
+# batching only takes effect when the model runs on a device.
+yolov5_batch_size = 4
 
 # Decompose movie with annotated detection frames for training
 save_frames = False
@@ -71,27 +98,39 @@ if write_processed_movie:
     success = writer.open(output_fname, fourcc, movie_fps, movie_res, True)
     print('opened = {}'.format(success))
 
-# cap = cv2.VideoCapture(0) # Capture video from camera
+if use_nvdec and use_yolov5_watcher:
+    # Decode, scale and colorspace-convert on the GPU's NVDEC engine; only
+    # the final BGR frame crosses PCIe
+    from src.util.nvdec import NvDecReader
 
-# Get the width and height of frame
-width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) + 0.5)
-height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) + 0.5)
+    container = None
+    nv_reader = NvDecReader(video_path)
+    frame_iter = nv_reader
+    width = nv_reader.out_width
+    height = nv_reader.out_height
+else:
+    # PyAV decoder releases the GIL between frames (unlike cv2.VideoCapture),
+    # so decode genuinely overlaps inference on the main thread
+    container = av.open(video_path)
+    video_stream = container.streams.video[0]
+    video_stream.thread_type = 'SLICE'
+    frame_iter = container.decode(video_stream)
 
-print('w={}, h={}'.format(width, height))
+    # Get the width and height of frame
+    width = video_stream.codec_context.width
+    height = video_stream.codec_context.height
 
-ret, frame = cap.read()
-print('Frame size = {}x{}'.format(frame.shape[1], frame.shape[0]))
+print('w={}, h={}'.format(width, height))
 
-# Init 
+# Init
 framecount = 0
-lastframe_time = datetime.now()
-skip_counter = 0
-
-class_metadata = {0: {'label': 'forklift', 
-                      'color': (55, 125, 225), 
-                      'vert_offset': 0.0}, 
-                  1: {'label': 'person', 
-                      'color': (225, 125, 35), 
+lastframe_time = monotonic_ns()
+
+class_metadata = {0: {'label': 'forklift',
+                      'color': (55, 125, 225),
+                      'vert_offset': 0.0},
+                  1: {'label': 'person',
+                      'color': (225, 125, 35),
                       'vert_offset': -.22},}
 
 if use_mobilenet:
@@ -99,10 +138,10 @@ if use_mobilenet:
     from src.detectors.mobilenet_watcher import MobileNetWatcher
 
     watcher = MobileNetWatcher(frame_buffer=None,
-                               display_video=True, 
+                               display_video=True,
                                confidence_threshold=0.25,
                                ignore_classes=['bottle', ])
-    
+
     # def __init__(self,
     #              model='MobileNetSSD_deploy.caffemodel',
     #              proto='MobileNetSSD_deploy.prototxt',
@@ -118,27 +157,37 @@ elif use_motion_watcher:
                             threshold=0.04,
                             full_detection_frame=True,
                             min_area=1600,
-                            memory=0.1, 
+                            memory=0.1,
                             gaussian_blur_size=(11, 11),
                             dilation_kernel_size=(19, 19))
 elif use_yolov5_watcher:
     from src.detectors.yolov5_watcher import YoloV5Watcher
 
-    watcher = YoloV5Watcher(frame_buffer=None, 
+    watcher = YoloV5Watcher(frame_buffer=None,
                             model_path=model_path,
                             class_metadata=class_metadata,
                             input_size=640)
 
 else:
     detection_events = CannedDetector.load_canned_events('retained_metadata.pkl')
-    watcher = CannedDetector(detection_events, 
+    watcher = CannedDetector(detection_events,
                              class_metadata=class_metadata,
                              frame_buffer=None)
 
-detection_events = OrderedDict()
-tracker = ObjectTracker(class_metadata=class_metadata, 
+# Stream one JSON line per event-bearing frame rather than accumulating an
+# in-memory dict and rewriting the whole file at exit
+events_file = None
+if save_frames:
+    events_file = open(save_loc + '/detection_events.jsonl', 'w')
+
+tracker = ObjectTracker(class_metadata=class_metadata,
                         distance_threshold=dist_threshold)
 
+if use_yolov5_watcher and watcher.device != 'cpu':
+    batch_size = yolov5_batch_size
+else:
+    batch_size = 1
+
 def save_frame(frame, fname, path=save_loc):
     filename = path + '/' + fname
     cv2.imwrite(filename, frame)
@@ -159,39 +208,190 @@ def save_metadata_and_frame(frame, events, fname_base, path=save_loc):
     save_metadata(events, fname_meta, path=path)
 
 
-while(cap.isOpened()):
-    ret, frame = cap.read()
+# Pipeline queues & stop signal ('q' key or EOF)
+read_q = Queue(maxsize=prefetch)
+write_q = Queue(maxsize=prefetch)
+stop_event = Event()
+
+# Frame buffers are preallocated and cycled rather than allocated per frame.
+# One slot per frame that can be in flight at once (both bounded queues, a
+# full inference batch, the frame the writer stage is holding, and the frame
+# the reader is currently landing) - a slot can't be overwritten until the
+# writer has drained the frame that last used it.
+pool_size = 2*prefetch + yolov5_batch_size + 2
+
+# Resize destinations for the processor stage.  The config proves at load
+# time whether resizing is needed at all; with scale_factor 1.0 the loop
+# skips the resize (and the pool) entirely.  The YoloV5 path never needs
+# it either - AutoShape already letterboxes every frame to input_size, so
+# a demo-side resize would just scale the same frame twice on CPU.
+need_resize = scale_factor != 1.0 and not use_yolov5_watcher
+dst_w = int(scale_factor*width)
+dst_h = int(scale_factor*height)
+resize_pool = [np.empty((dst_h, dst_w, 3), dtype=np.uint8)
+               for _ in range(pool_size)] if need_resize else []
+
+# Landing buffers for the NVDEC reader, which reuses a single host buffer
+# across decodes
+if container is None:
+    frame_pool = [np.empty((height, width, 3), dtype=np.uint8)
+                  for _ in range(pool_size)]
+
+
+def read_frames():
+    """
+    Reader stage.  Decodes frames from the movie container, applies frame
+    skipping, and pushes (framecount, timestamp, frame) tuples into read_q.
+    Pushes a None sentinel on end of stream.
+    """
+    read_count = 0
+    skip_counter = 0
+    last_hash = None
+
+    try:
+        for decoded in frame_iter:
+            if stop_event.is_set():
+                break
+
+            skip_counter += 1
+            if skip_counter < skip_count:
+                # Skipped frames never pay for the ndarray conversion
+                continue
+
+            skip_counter = 0
+            if container is not None:
+                frame = decoded.to_ndarray(format='bgr24')
+            else:
+                # NvDecReader reuses its host buffer every frame; land the
+                # frame in a recycled pool slot instead of allocating a copy
+                frame = frame_pool[(read_count + 1) % pool_size]
+                np.copyto(frame, decoded)
+
+            if dedup_frames:
+                # Hash a 32x32 grayscale thumbnail (~20us) and drop exact
+                # repeats of the previous frame; each duplicate caught saves
+                # a full inference pass
+                small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+                gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                new_hash = frame_hash(gray.tobytes())
+                if new_hash == last_hash:
+                    continue
+                last_hash = new_hash
+
+            read_count += 1
+            read_q.put((read_count, monotonic_ns(), frame))
+    finally:
+        # Always deliver the sentinel - a mid-stream decode error must not
+        # leave the processor blocked on read_q forever
+        read_q.put(None)
+
+
+def write_frames():
+    """
+    Writer/display stage.  Pops processed frames from write_q, writes them to
+    the output movie (if enabled) and displays them.  Stops on a None sentinel
+    or when 'q' is pressed.
+    """
+    poll_key = getattr(cv2, 'pollKey', None)
+    display_count = 0
+
+    while True:
+        item = write_q.get()
+
+        if item is None:
+            break
 
-    skip_counter += 1
-    if skip_counter < skip_count:
-        continue
+        processed_frame, collisions = item
 
-    skip_counter = 0
+        # Collision overlays are drawn here so the rasterization overlaps
+        # the processor stage's work on the next frame
+        for bbox, bbox_other in collisions:
+            DetectedObject.draw_collision(processed_frame, bbox, bbox_other)
+
+        if write_processed_movie:
+            writer.write(processed_frame)
 
-    if ret == True:
-        framecount += 1
+        if display_video:
+            cv2.imshow('frame', processed_frame)
+
+            # pollKey (OpenCV 4.5+) pumps the GUI queue without blocking;
+            # older builds fall back to the 1ms waitKey every 5th frame,
+            # still plenty to catch the 'q' key
+            if poll_key is not None:
+                key = poll_key()
+            elif display_count % 5 == 0:
+                key = cv2.waitKey(1)
+            else:
+                key = -1
+            display_count += 1
+
+            if (key & 0xFF) == ord('q'): # Hit `q` to exit
+                stop_event.set()
+                break
+
+
+reader_thread = Thread(target=read_frames, args=())
+writer_thread = Thread(target=write_frames, args=())
+reader_thread.start()
+writer_thread.start()
+
+# Processor stage (main thread).  Detection + tracking stay single-threaded
+# since ObjectTracker state depends on seeing frames in order.  Frames are
+# collected into batches of batch_size for a single inference call; a
+# partial batch flushes on EOF or if the reader stalls.
+eof = False
+while not stop_event.is_set() and not eof:
+
+    batch = list()
+    while len(batch) < batch_size:
+        try:
+            frame_tuple = read_q.get() if len(batch) == 0 \
+                else read_q.get(timeout=0.03)
+        except Empty:
+            break
 
-        frame_shape = frame.shape
+        if frame_tuple is None:
+            eof = True
+            break
 
-        frame = cv2.resize(frame, (int(scale_factor*frame_shape[1]), 
-                                   int(scale_factor*frame_shape[0])))
+        framecount, now, frame = frame_tuple
 
-        frame_shape = frame.shape
+        if need_resize:
+            resized = resize_pool[framecount % pool_size]
+            cv2.resize(frame, (dst_w, dst_h), dst=resized,
+                       interpolation=cv2.INTER_AREA)
+            frame = resized
 
-        now = datetime.now()
-        td = (now-lastframe_time).total_seconds()
-        lastframe_time = now
-        fps_text = '{:2.01f} FPS'.format(1.0/td)
-        #cv2.putText(frame, fps_text, (10, 30), 
-        #           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 250, 100), 1, cv2.LINE_AA)
+        batch.append((framecount, now, frame))
+
+    if len(batch) == 0:
+        break
+
+    # The watcher annotates in place, so processed_frame aliases its input.
+    # The training-capture path saves the clean frame alongside the
+    # annotated one - give the watcher a copy to draw on in that case.
+    frames = [b[2] for b in batch]
+    if save_frames:
+        frames = [f.copy() for f in frames]
+
+    if batch_size > 1:
+        processed = watcher.process_frames([b[1] for b in batch], frames)
+    else:
+        framecount, now, frame = batch[0]
+        processed = [watcher.process_frame(now, frames[0])]
 
-        # frame = cv2.flip(frame,0)
-        # write the flipped frame
+    # Tracking and output run per frame, in timestamp order
+    for (framecount, now, frame), (processed_frame, events) in zip(batch, processed):
 
-        processed_frame, events = watcher.process_frame(now, frame)
+        t_now = monotonic_ns()
+        td = (t_now - lastframe_time) * 1e-9
+        lastframe_time = t_now
+        fps_text = '{:2.01f} FPS'.format(1.0/td)
+        #cv2.putText(frame, fps_text, (10, 30),
+        #           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 250, 100), 1, cv2.LINE_AA)
 
         tracker.update_detection_events(processed_frame, events)
-        tracker.collision_detect(processed_frame)
+        collisions = tracker.collision_detect(processed_frame, draw=False)
 
         if save_frames and events is not None and len(events) > 0:
             fname = 'frame_{}.jpeg'.format(framecount)
@@ -199,31 +399,62 @@ while(cap.isOpened()):
             # save_metadata_and_frame(frame, events, fname)
             fname_bb = 'frame_{}.bb.jpeg'.format(framecount)
             save_frame(processed_frame, fname_bb)
-            detection_events[framecount] = events
-
-        if write_processed_movie:
-            writer.write(processed_frame)
 
-        cv2.imshow('frame', processed_frame)
-        
-        if (cv2.waitKey(1) & 0xFF) == ord('q'): # Hit `q` to exit
-            break
-
-        if sleep_time is not None:
-            sleep(sleep_time)
-    else:
+            if hasattr(events, 'to_dict'):
+                event_records = events.to_dict(orient='records')
+            else:
+                event_records = list(events)
+            # default=float handles the numpy scalars older pandas leaves
+            # in to_dict records, which json rejects outright
+            events_file.write(json.dumps({'frame': framecount,
+                                          'events': event_records},
+                                         default=float) + '\n')
+
+        # Once 'q' kills the writer nothing drains write_q, and it can die
+        # while we're already waiting - never commit to an untimed put
+        item = (processed_frame, collisions)
+        while not stop_event.is_set():
+            try:
+                write_q.put(item, timeout=0.1)
+                break
+            except Full:
+                pass
+
+# Unblock the reader if we quit early, then flush both stages
+while reader_thread.is_alive():
+    try:
+        read_q.get(timeout=0.1)
+    except Empty:
+        pass
+
+reader_thread.join()
+
+# The writer can still exit on 'q' at any point during this flush; if it
+# does, discard its backlog so the sentinel fits instead of blocking on a
+# queue nobody drains
+while True:
+    try:
+        write_q.put(None, timeout=0.1)
         break
+    except Full:
+        if stop_event.is_set():
+            try:
+                write_q.get_nowait()
+            except Empty:
+                pass
+
+writer_thread.join()
 
 print('Total frames = {}'.format(framecount))
 
-if save_frames:
-    pass 
-    # save_metadata(detection_events, 'detection_events.json')
+if events_file is not None:
+    events_file.close()
 
 if write_processed_movie:
     writer.release()
     writer = None
 
 # Release everything if job is finished
-cap.release()
+if container is not None:
+    container.close()
 cv2.destroyAllWindows()
@@ -10,13 +10,13 @@ logger = get_default_logger()
 
 class CannedDetector(FrameWatcher):
 
-    """"
+    """
     class CannedDetector(FrameWatcher)
 
     Implements a frame watcher detection object that uses pre-processed detection metadata
     as a mock detector.  This was originally built from hand-labeled frames to build the object
     tracking algorithm and Kalman filter code (prior to YoloV5 detector being in place).
-    """"
+    """
 
     DEFAULT_COLOR = (225, 175, 35)
     ANGLE_MULT = np.cos(np.pi * 0.44)
@@ -2,8 +2,6 @@ import time
 import cv2
 import numpy as np
 
-from datetime import datetime
-
 from threading import Thread
 from src.frame_buffer import FrameBuffer
 from src.util.log_utils import get_default_logger
@@ -24,6 +22,16 @@ class FrameWatcher:
 
     FPS_FRAMES=20
 
+    # __slots__ keeps instance attribute access off the per-instance dict.
+    # Subclasses that don't declare __slots__ still get a __dict__ for
+    # their own attributes, so nothing changes for them.
+    __slots__ = ('_buffer', '_frame_index', '_thread', '_running',
+                 'display_video', 'display_window_name', 'name',
+                 '_prev_timestamp', '_fps_counter', '_fps_time', '_fps',
+                 '_text_size', '_circle_center', '_circle_radius',
+                 '_circle_color', '_text_origin', '_text_color', '_text',
+                 '_sprite', '_sprite_mask', 'process_frame')
+
     def __init__(self, frame_buffer: FrameBuffer,
                  name='WatcherProcess',
                  display_video:bool = False,
@@ -38,13 +46,69 @@ class FrameWatcher:
             display_window_name = name
         self.display_window_name = display_window_name
         self.name = name
-        self._prev_timestamp = datetime.now()
+        self._prev_timestamp = time.monotonic_ns()
 
         self._fps_counter=0
-        self._fps_time = datetime.now()
+        self._fps_time = time.monotonic_ns()
         self._fps = 0.0
         self._text_size = 0.5
 
+        # Overlay drawing parameters are invariant across frames - set once
+        # here rather than rebuilt on every process_frame call
+        # color_index = self._buffer.frame_index+1
+        color_index = 0
+        self._circle_center = (8, 12)
+        self._circle_radius = 4
+        self._circle_color = (10+10*color_index, 40+30*color_index, 200)
+        self._text_origin = (17, 16)
+        self._text_color = (150, 120, 50)
+        self._text = '{} {:.01f} FPS'.format(self.name, self._fps)
+
+        # Rendered lazily on first use so subclasses can still adjust
+        # _text_size after construction
+        self._sprite = None
+        self._sprite_mask = None
+
+        # Frequently used references captured as closure locals; the
+        # per-frame path then skips their attribute lookups entirely.
+        # Bound here, after the instance exists, so subclass overrides of
+        # _custom_processing resolve correctly.
+        asarray = np.asarray
+        copyto = np.copyto
+        track_fps = self._track_fps
+        custom_processing = self._custom_processing
+        render_sprite = self._render_overlay_sprite
+
+        def process_frame(timestamp, frame):
+            """
+            def process_frame(self, timestamp, frame)
+
+            Renders the common watcher overlay (status circle + FPS text)
+            onto the frame and hands it to _custom_processing.  Built as a
+            per-instance closure in __init__ - hot references are captured
+            as locals instead of resolved per call.
+
+            :param timestamp: int, monotonic-ns timestamp associated with frame
+            :param frame: CV2 image (single video frame)
+            :return: tuple (processed_frame, events)
+            """
+            frame = asarray(frame)
+
+            if track_fps() or self._sprite is None:
+                # Overlay content only changes when the FPS estimate does
+                self._text = '{} {:.01f} FPS'.format(self.name, self._fps)
+                render_sprite()
+
+            # Blit the cached overlay sprite instead of rasterizing the
+            # circle and text glyphs on every frame
+            sprite = self._sprite
+            h, w = sprite.shape[:2]
+            copyto(frame[:h, :w], sprite, where=self._sprite_mask)
+
+            return custom_processing(timestamp, frame)
+
+        self.process_frame = process_frame
+
     @property
     def frame_index(self):
         """ 
@@ -74,30 +138,39 @@ class FrameWatcher:
         try:
 
             logger.info('{} running'.format(self.name))
-            self._prev_timestamp = datetime.now()
-            last_log = datetime.now()
+            self._prev_timestamp = time.monotonic_ns()
+            last_log = time.monotonic_ns()
 
             while self._running:
                 while self._frame_index != self._buffer.frame_index and self._running:
                     self._frame_index = (self._frame_index + 1) % self._buffer.buffer_len
 
-                    frame_tuple = self._buffer.buffer[self._frame_index]
+                    frame_tuple = self._buffer.get_frame(self._frame_index)
 
                     if frame_tuple is None:
                         continue
 
                     timestamp, frame = frame_tuple
-                    processed_frame, events = self.process_frame(timestamp, frame)
+
+                    # get_frame returns a view into the shared ring and
+                    # process_frame annotates in place; copy so watchers
+                    # sharing one buffer don't scribble on each other's
+                    # input (or on get_current_frame snapshots)
+                    processed_frame, events = self.process_frame(timestamp, frame.copy())
                     self._prev_timestamp = timestamp
                     if self.display_video:
                         self._display_video(processed_frame)
 
-                # If frame buffer exhausted, wait 5ms before checking again
-                time.sleep(0.005)
+                # Frame buffer exhausted - sleep until the producer signals
+                # a new frame (no polling; the timeout keeps the heartbeat
+                # and stop() checks alive while idle)
+                with self._buffer.new_frame_cond:
+                    if self._frame_index == self._buffer.frame_index:
+                        self._buffer.new_frame_cond.wait(timeout=1.0)
 
-                if (datetime.now()-last_log).total_seconds() > 60:
+                if (time.monotonic_ns() - last_log) * 1e-9 > 60:
                     logger.info('{} heartbeat {:08d}'.format(self.name, self._buffer.frame_count))
-                    last_log = datetime.now()
+                    last_log = time.monotonic_ns()
 
         except Exception as ex:
             logger.error('Exception caught in {}'.format(self.name))
@@ -110,52 +183,63 @@ class FrameWatcher:
         Terminate running thread, stop processing new frames in buffer.
         """
         self._running = False
+        if self._buffer is not None:
+            # Wake _watch immediately if it is waiting on the buffer
+            with self._buffer.new_frame_cond:
+                self._buffer.new_frame_cond.notify_all()
         self._thread.join()
         logger.info('Stopped {}'.format(self.name))
 
     def _track_fps(self):
+        """
+        Updates the rolling FPS estimate every FPS_FRAMES frames.
+        Returns True when the estimate was refreshed this call.
+        """
         self._fps_counter += 1
         if self._fps_counter == self.FPS_FRAMES:
-            new_time = datetime.now()
-            time_s = (new_time - self._fps_time).total_seconds()
+            # monotonic_ns is ~10x cheaper than datetime.now() and doesn't
+            # allocate a datetime object per call
+            new_time = time.monotonic_ns()
+            time_s = (new_time - self._fps_time) * 1e-9
             self._fps = self.FPS_FRAMES / time_s
             self._fps_time = new_time
             self._fps_counter = 0
-        return self._fps
-
-    def process_frame(self, timestamp, frame):
+            return True
+        return False
 
-        frame = np.array(frame)
-
-        time_delta = (timestamp - self._prev_timestamp).total_seconds()
-        fps = self._track_fps()
-        text = '{} {:.01f} FPS'.format(self.name, fps)
-
-        processed_frame = frame
-
-        # color_index = self._buffer.frame_index+1
-        color_index = 0
-        radius = 4
-        processed_frame = cv2.circle(processed_frame, (8,12),
-                                     radius, (10+10*color_index, 40+30*color_index, 200), 2)
-
-        frame_shape = frame.shape
-        origin_shadow = (18, 19)
-        origin = (17, 16)
-        text_color = (150, 120, 50)
-
-        processed_frame = cv2.putText(processed_frame, text, origin,
-                                      cv2.FONT_HERSHEY_SIMPLEX,
-                                      self._text_size, text_color, 1)
-        processed_frame, events = self._custom_processing(timestamp, processed_frame)
+    def _render_overlay_sprite(self):
+        """
+        def _render_overlay_sprite(self)
 
-        return processed_frame, events
+        Pre-rasterizes the corner overlay (status circle + FPS text) into a
+        small sprite with a glyph mask.  Called only when the overlay text
+        changes (every FPS_FRAMES frames); per frame the sprite is blitted
+        into the corner of the processed frame, replacing the full
+        cv2.circle/cv2.putText rasterization per call.
+        """
+        (text_w, text_h), baseline = cv2.getTextSize(self._text,
+                                                     cv2.FONT_HERSHEY_SIMPLEX,
+                                                     self._text_size, 1)
+        w = self._text_origin[0] + text_w + 2
+        h = max(self._text_origin[1] + baseline + 2,
+                self._circle_center[1] + self._circle_radius + 2)
+
+        sprite = np.zeros((h, w, 3), dtype=np.uint8)
+        cv2.circle(sprite, self._circle_center, self._circle_radius,
+                   self._circle_color, 2)
+        cv2.putText(sprite, self._text, self._text_origin,
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    self._text_size, self._text_color, 1)
+
+        self._sprite = sprite
+        # Only glyph/circle pixels get copied onto the frame
+        self._sprite_mask = (sprite.max(axis=2) > 0)[:, :, None]
 
     def _custom_processing(self, timestamp, frame):
         """
         def _custom_processing(self, timestamp, frame)
 
-        :param timestamp: datetime, associated with frame
+        :param timestamp: int, monotonic-ns timestamp associated with frame
         :param frame: CV2 image (single video frame) 
         :return: tuple (processed_frame, events)
 
@@ -174,4 +258,7 @@ class FrameWatcher:
 
     def _display_video(self, frame):
         cv2.imshow(self.display_window_name, frame)
-        cv2.waitKey(1) # 1ms wait
+        if hasattr(cv2, 'pollKey'):
+            cv2.pollKey() # non-blocking GUI pump (OpenCV 4.5+)
+        else:
+            cv2.waitKey(1) # 1ms wait
@@ -1,6 +1,7 @@
 import numpy as np
 import cv2
 import pandas as pd
+import torch
 # import pickle
 
 from src.detectors.framewatcher import FrameWatcher
@@ -22,19 +23,76 @@ class YoloV5Watcher(FrameWatcher):
     ANGLE_MULT = np.cos(np.pi * 0.44)
 
     def __init__(self, model_path='../models/best.pt',
-                 class_metadata=dict(), 
+                 class_metadata=dict(),
                  input_size=640,
+                 device=None,
+                 half=True,
                  **kwargs):
 
-        # TODO: switch input_size to an enum for allowed YoloV5 
+        # TODO: switch input_size to an enum for allowed YoloV5
         # detection resolutions?
 
         super().__init__(**kwargs)
         self.frame_count = 0
         self.class_metadata = class_metadata
         self.input_size = input_size
-        logger.info('YoloV5Detector loading {}'.format(model_path))
-        self.model = attempt_load(model_path).fuse().autoshape()
+        self._batch_results = None
+
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = device
+        # FP16 roughly doubles ALU throughput and halves bandwidth on
+        # tensor-core GPUs; no benefit (and poor support) on CPU
+        self.half = half and device != 'cpu'
+
+        logger.info('YoloV5Detector loading {} on {}'.format(model_path, device))
+        if model_path.endswith('.engine'):
+            # TensorRT engine, exported from the .pt weights via YoloV5's
+            # export.py --include engine --half --imgsz <input_size>
+            from models.common import AutoShape, DetectMultiBackend
+            backend = DetectMultiBackend(model_path,
+                                         device=torch.device(device),
+                                         fp16=self.half)
+            self.model = AutoShape(backend)
+        else:
+            self.model = attempt_load(model_path).fuse().autoshape()
+            self.model.to(device)
+            if self.half:
+                self.model.half()
+
+        if device != 'cpu':
+            self._warmup()
+
+    def _warmup(self):
+        # First inference pays one-time costs (cudnn autotune, allocator
+        # pools); run a dummy pass so it doesn't land on frame 1
+        dummy = torch.zeros(1, 3, self.input_size, self.input_size,
+                            device=self.device)
+        if self.half:
+            dummy = dummy.half()
+        self.model(dummy)
+
+    def process_frames(self, timestamps, frames):
+        """
+        def process_frames(self, timestamps, frames)
+
+        Batched variant of process_frame.  Runs a single model call over all
+        frames to amortize per-call overhead (kernel launch, workspace setup
+        - a win on GPU, not on CPU), then demuxes detections back through
+        process_frame in order, so overlay drawing and event handling are
+        identical to the single-frame path.
+
+        :param timestamps: sequence of monotonic-ns ints, one per frame
+        :param frames: sequence of CV2 images
+        :return: list of (processed_frame, events) tuples, in input order
+        """
+        results = self.model(list(frames), size=self.input_size)
+        self._batch_results = [x.cpu().numpy() for x in results.xywh]
+        try:
+            return [self.process_frame(timestamp, frame)
+                    for timestamp, frame in zip(timestamps, frames)]
+        finally:
+            self._batch_results = None
 
     def _custom_processing(self, timestamp, frame):
 
@@ -42,10 +100,17 @@ class YoloV5Watcher(FrameWatcher):
         # to YoloV5 detection API
 
         # events = self.detection_events.get(self.frame_count, None)
-        results = self.model(frame, size=self.input_size)
+        if self._batch_results is not None:
+            xywh = self._batch_results.pop(0)
+        else:
+            results = self.model(frame, size=self.input_size)
+            # xywh tensors live on the model's device (and may be fp16);
+            # bring them to host memory before the DataFrame build
+            xywh = results.xywh[0].cpu().numpy() if len(results.xywh) > 0 else None
+
         events = pd.DataFrame()
-        if len(results.xywh) > 0:
-            tmp = np.array(results.xywh[0])
+        if xywh is not None and len(xywh) > 0:
+            tmp = xywh
             events['cls'] = tmp[:,5].astype(int)
             events['x'] = tmp[:,0] / frame.shape[1]
             events['y'] = tmp[:,1] / frame.shape[0]
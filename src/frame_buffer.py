@@ -1,5 +1,7 @@
-from datetime import datetime, timedelta
-import cv2
+import time
+from threading import Condition
+
+import numpy as np
 
 
 class FrameBuffer:
@@ -7,17 +9,25 @@ class FrameBuffer:
     class FrameBuffer
 
     Implements a circular buffer for continuous collection and asynchronous processing of video frames.
+    Consumers can wait on new_frame_cond instead of polling; the producer notifies it on every new frame.
+
+    Storage is structure-of-arrays: one preallocated uint8 ring for frame pixels
+    (allocated lazily from the first frame's shape), an int64 array of
+    monotonic-ns timestamps, and a validity mask in place of None sentinels.
+    Producers copy into preallocated slots and consumers read views, so the
+    steady-state hot path allocates nothing per frame.
     """
 
     def __init__(self, n_frames=5):
 
+        self._buffer_len = n_frames
         self._frame_index = n_frames-1
-        self.buffer = list()
-
-        for i in range(0, n_frames):
-            self.buffer.append(None)
+        self._frames = None
+        self._ts = np.empty(n_frames, dtype=np.int64)
+        self._valid = np.zeros(n_frames, dtype=bool)
 
         self._frame_count = 0
+        self.new_frame_cond = Condition()
 
     @property
     def frame_count(self):
@@ -29,16 +39,34 @@ class FrameBuffer:
 
     @property
     def buffer_len(self):
-        return len(self.buffer)
+        return self._buffer_len
 
     def new_frame(self, frame):
         # Place a new frame in the buffer
-        idx = (self._frame_index + 1) % self.buffer_len
-        timestamp = datetime.now()
+        if self._frames is None:
+            self._frames = np.empty((self._buffer_len,) + frame.shape,
+                                    dtype=np.uint8)
 
-        self.buffer[idx] = (timestamp, frame)
+        idx = (self._frame_index + 1) % self._buffer_len
+        np.copyto(self._frames[idx], frame)
+        self._ts[idx] = time.monotonic_ns()
+        self._valid[idx] = True
         self._frame_index = idx
         self._frame_count += 1
 
+        with self.new_frame_cond:
+            self.new_frame_cond.notify_all()
+
+    def get_frame(self, idx):
+        """
+        Returns (timestamp_ns, frame) for buffer slot idx, or None if the
+        slot hasn't been filled yet.  The frame is a view into the ring -
+        consumers should be done with it before the ring wraps around.
+        """
+        if not self._valid[idx]:
+            return None
+
+        return self._ts[idx], self._frames[idx]
+
     def get_current_frame(self):
-        return self.buffer[self._frame_index]
+        return self.get_frame(self._frame_index)
@@ -2,6 +2,27 @@ import cv2
 import numpy as np
 from src.tracking.kalman_filter import KalmanFilter
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        return wrap
+
+
+@njit(cache=True, fastmath=True)
+def _distance(x1, y1, x2, y2):
+    dx = x1 - x2
+    dy = y1 - y2
+    return np.sqrt(dx*dx + dy*dy)
+
+
+@njit(cache=True, fastmath=True)
+def _bbox_overlap(x1, y1, x2, y2, x1b, y1b, x2b, y2b):
+    return x1 <= x2b and x2 >= x1b and y1 <= y2b and y2 >= y1b
+
 
 class ObjectTracker:
 
@@ -28,7 +49,16 @@ class ObjectTracker:
 
         self.cleanup_objects()
 
-    def collision_detect(self, frame):
+    def collision_detect(self, frame, draw=True):
+        """
+        Detects projected-bbox overlaps between tracked objects of
+        different classes.  With draw=True the collision boxes are rendered
+        onto frame immediately; with draw=False drawing is left to the
+        caller (e.g. deferred to the display/writer stage of a pipeline).
+
+        :return: list of (bbox, bbox_other) pairs in normalized coordinates
+        """
+        collisions = list()
 
         for idx1, obj1 in enumerate(self.detected_objects):
 
@@ -40,7 +70,11 @@ class ObjectTracker:
                 if obj1.class_index == obj2.class_index:
                     continue
 
-                obj1.collision_detect(obj2, frame)
+                pair = obj1.collision_detect(obj2, frame if draw else None)
+                if pair is not None:
+                    collisions.append(pair)
+
+        return collisions
 
     def cleanup_objects(self):
         pass
@@ -96,8 +130,8 @@ class DetectedObject:
         if point2 is None:
             point2 = self.position_plus_one
 
-        squared_distance = np.power(point1[0]-point2[0], 2) + np.power(point1[1]-point2[1], 2)
-        return np.sqrt(squared_distance)
+        return _distance(float(point1[0]), float(point1[1]),
+                         float(point2[0]), float(point2[1]))
 
     def update_from_events(self, frame, events):
         
@@ -168,24 +202,25 @@ class DetectedObject:
         y2 = center[1] + csf*self.height / 2.
         return (x1, y1, x2, y2)
 
-    def collision_detect(self, other_obj, frame):
+    def collision_detect(self, other_obj, frame=None):
 
         if self.projected_position is None or other_obj.projected_position is None:
-            return False
+            return None
 
         x1, y1, x2, y2 = self.projected_bbox()
         x1b, y1b, x2b, y2b = other_obj.projected_bbox()
 
-        x_overlap = x1 <= x2b and x2 >= x1b
-        y_overlap = y1 <= y2b and y2 >= y1b
-
-        if x_overlap and y_overlap:
+        if _bbox_overlap(x1, y1, x2, y2, x1b, y1b, x2b, y2b):
             print('Collision detect!! {}:{}'.format((x1, y1, x2, y2), (x1b, y1b, x2b, y2b)))
-            color = (25, 25, 255)
-            cv2.rectangle(frame, ( int(x1*frame.shape[1]), int(y1*frame.shape[0])), 
-                                 ( int(x2*frame.shape[1]), int(y2*frame.shape[0])), color, 2)
-            cv2.rectangle(frame, ( int(x1b*frame.shape[1]), int(y1b*frame.shape[0])), 
-                                 ( int(x2b*frame.shape[1]), int(y2b*frame.shape[0])), color, 2)
-            return True
+            if frame is not None:
+                self.draw_collision(frame, (x1, y1, x2, y2), (x1b, y1b, x2b, y2b))
+            return ((x1, y1, x2, y2), (x1b, y1b, x2b, y2b))
 
-        return False
+        return None
+
+    @staticmethod
+    def draw_collision(frame, bbox, bbox_other):
+        color = (25, 25, 255)
+        for x1, y1, x2, y2 in (bbox, bbox_other):
+            cv2.rectangle(frame, ( int(x1*frame.shape[1]), int(y1*frame.shape[0])),
+                                 ( int(x2*frame.shape[1]), int(y2*frame.shape[0])), color, 2)